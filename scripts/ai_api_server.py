@@ -2,10 +2,12 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 import json
 import logging
-from datetime import datetime
+import math
+from datetime import datetime, timedelta
 import threading
 import time
 from ai_yield_predictor import YieldPredictor
+from model_monitor import ModelMonitor, to_target_date
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,10 +20,62 @@ CORS(app)
 predictor = YieldPredictor()
 prediction_cache = {}
 cache_ttl = 600  # 10 minutes
+default_pool = 'default'  # Scored by the background loop only
+# External pools are reported only: retraining refits on fetch_market_data(),
+# so only the server's own pool can justify a retrain
+monitor = ModelMonitor(predictor, retrain_pools=[default_pool])
+last_observed_date = None
+training_lock = threading.Lock()
+model_lock = threading.Lock()  # Guards swapping the live model and scaler
+TRAINING_IN_PROGRESS = 'Training already in progress'
+
+def run_training():
+    """Retrain on fresh data and swap in the result; returns an error message on failure"""
+    if not training_lock.acquire(blocking=False):
+        return TRAINING_IN_PROGRESS
+    
+    try:
+        # Train a separate instance so the live predictor keeps serving meanwhile
+        candidate = YieldPredictor(
+            sequence_length=predictor.sequence_length,
+            lstm_units=predictor.lstm_units,
+            dropout=predictor.dropout,
+            batch_size=predictor.batch_size,
+            epochs=predictor.epochs,
+            feature_columns=predictor.feature_columns
+        )
+        
+        data = candidate.fetch_market_data()
+        if data is None:
+            return 'Failed to fetch training data'
+        
+        history = candidate.train_model(data)
+        if history is None:
+            return 'Failed to train model'
+        
+        with model_lock:
+            predictor.model = candidate.model
+            predictor.scaler = candidate.scaler
+        
+        candidate.save_model('yield_prediction_model.h5')
+        monitor.mark_retrained()
+        return None
+    finally:
+        monitor.mark_retrain_attempt()
+        training_lock.release()
+
+def check_retrain(pool):
+    """Retrain in the background when the monitor's thresholds are crossed"""
+    if training_lock.locked() or not monitor.should_retrain(pool):
+        return False
+    
+    logger.info(f"Triggering automatic retrain for {pool}: {monitor.get_retrain_reasons(pool)}")
+    threading.Thread(target=run_training, daemon=True).start()
+    return True
 
 def update_predictions():
     """Background task to update predictions periodically"""
-    global prediction_cache
+    global prediction_cache, last_observed_date
     
     while True:
         try:
@@ -30,11 +84,32 @@ def update_predictions():
             # Fetch fresh data
             data = predictor.fetch_market_data()
             if data is not None:
-                # Make prediction
                 recent_data = data.tail(50)
-                predicted_apy = predictor.predict_yield(recent_data)
+                last_date = recent_data['date'].iloc[-1]
+                data_advanced = last_observed_date is None or last_date > last_observed_date
+                
+                if data_advanced:
+                    last_observed_date = last_date
+                    
+                    # Score pending predictions whose target date has now been observed
+                    observed_dates = data['date'].dt.strftime('%Y-%m-%d')
+                    for target_date in monitor.get_pending_targets(default_pool):
+                        realized = data.loc[observed_dates == target_date, 'apy']
+                        if not realized.empty:
+                            monitor.record_realized(default_pool, target_date, realized.iloc[-1])
+                
+                # Make prediction
+                with model_lock:
+                    predicted_apy = predictor.predict_yield(recent_data)
                 
                 if predicted_apy:
+                    if data_advanced:
+                        monitor.record_prediction(
+                            default_pool, last_date + timedelta(days=1), predicted_apy,
+                            recent_data[predictor.feature_columns].values[-1]
+                        )
+                        check_retrain(default_pool)
+                    
                     recommendations = predictor.get_rebalance_recommendation(recent_data, predicted_apy)
                     
                     prediction_cache = {
@@ -192,18 +267,11 @@ def retrain_model():
     try:
         logger.info("Starting model retraining...")
         
-        # Fetch fresh data
-        data = predictor.fetch_market_data()
-        if data is None:
-            return jsonify({'error': 'Failed to fetch training data'}), 500
-        
-        # Train model
-        history = predictor.train_model(data)
-        if history is None:
-            return jsonify({'error': 'Failed to train model'}), 500
-        
-        # Save model
-        predictor.save_model('yield_prediction_model.h5')
+        error = run_training()
+        if error == TRAINING_IN_PROGRESS:
+            return jsonify({'error': error}), 409
+        if error:
+            return jsonify({'error': error}), 500
         
         logger.info("Model retraining completed")
         
@@ -217,6 +285,103 @@ def retrain_model():
         logger.error(f"Error retraining model: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def parse_monitor_request(data, value_key):
+    """Validate pool, target date and APY value of a monitor request"""
+    pool = data.get('pool')
+    if not pool or not isinstance(pool, str):
+        raise ValueError('Missing pool')
+    
+    if data.get('target_date') is None:
+        raise ValueError('Missing target_date')
+    target_date = to_target_date(str(data['target_date']))
+    
+    if data.get(value_key) is None:
+        raise ValueError(f'Missing {value_key}')
+    value = parse_finite(data[value_key], value_key)
+    
+    return pool, target_date, value
+
+def parse_finite(value, name):
+    """Convert a request value to a finite float"""
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f'{name} must be finite')
+    return value
+
+@app.route('/api/monitor/predictions', methods=['POST'])
+def record_pool_prediction():
+    """Record an external pool's prediction for a target date (reporting only)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        try:
+            pool, target_date, predicted_apy = parse_monitor_request(data, 'predicted_apy')
+            features = data.get('features')
+            if features is not None:
+                features = [
+                    parse_finite(features[column], column) for column in predictor.feature_columns
+                ]
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid request: {e}'}), 400
+        
+        if pool == default_pool:
+            return jsonify({'error': f"Pool '{default_pool}' is recorded by the server"}), 409
+        
+        monitor.record_prediction(pool, target_date, predicted_apy, features)
+        
+        return jsonify({
+            'success': True,
+            'data': monitor.get_pool_stats(pool)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error recording prediction: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/monitor/realized', methods=['POST'])
+def record_realized_apy():
+    """Record the realized APY for an external pool's target date"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        try:
+            pool, target_date, realized_apy = parse_monitor_request(data, 'apy')
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid request: {e}'}), 400
+        
+        if pool == default_pool:
+            return jsonify({'error': f"Pool '{default_pool}' is recorded by the server"}), 409
+        
+        matched = monitor.record_realized(pool, target_date, realized_apy)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'matched_prediction': matched,
+                'stats': monitor.get_pool_stats(pool)
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"Error recording realized APY: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/monitor', methods=['GET'])
+def get_monitor_stats():
+    """Get rolling accuracy and drift statistics"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': {
+                **monitor.get_summary(),
+                'training_in_progress': training_lock.locked()
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting monitor stats: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 def initialize_predictor():
     """Initialize the predictor with training data"""
     try:
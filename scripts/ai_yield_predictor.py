@@ -13,15 +13,25 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_FEATURE_COLUMNS = [
+    'tvl', 'apy', 'volume_24h', 'price_change_24h', 
+    'market_cap', 'volatility', 'liquidity_ratio'
+]
+
 class YieldPredictor:
-    def __init__(self):
+    def __init__(self, sequence_length=30, lstm_units=(64, 32), dropout=0.2,
+                 batch_size=32, epochs=50, feature_columns=None):
         self.model = None
         self.scaler = MinMaxScaler()
-        self.feature_columns = [
-            'tvl', 'apy', 'volume_24h', 'price_change_24h', 
-            'market_cap', 'volatility', 'liquidity_ratio'
-        ]
-        self.sequence_length = 30  # 30 days of historical data
+        self.feature_columns = list(feature_columns or DEFAULT_FEATURE_COLUMNS)
+        if 'apy' not in self.feature_columns:
+            raise ValueError("feature_columns must include 'apy' (the prediction target)")
+        self.target_index = self.feature_columns.index('apy')
+        self.sequence_length = sequence_length  # days of historical data
+        self.lstm_units = tuple(lstm_units)
+        self.dropout = dropout
+        self.batch_size = batch_size
+        self.epochs = epochs
         
     def fetch_market_data(self):
         """Fetch historical market data for yield prediction"""
@@ -73,7 +83,7 @@ class YieldPredictor:
         for i in range(self.sequence_length, len(data)):
             # Use past sequence_length days to predict next day's APY
             sequence = data[i-self.sequence_length:i]
-            target = data[i, 1]  # APY is at index 1
+            target = data[i, self.target_index]
             sequences.append(sequence)
             targets.append(target)
         
@@ -81,11 +91,12 @@ class YieldPredictor:
     
     def build_model(self, input_shape):
         """Build LSTM model for yield prediction"""
+        first_units, second_units = self.lstm_units
         model = keras.Sequential([
-            keras.layers.LSTM(64, return_sequences=True, input_shape=input_shape),
-            keras.layers.Dropout(0.2),
-            keras.layers.LSTM(32, return_sequences=False),
-            keras.layers.Dropout(0.2),
+            keras.layers.LSTM(first_units, return_sequences=True, input_shape=input_shape),
+            keras.layers.Dropout(self.dropout),
+            keras.layers.LSTM(second_units, return_sequences=False),
+            keras.layers.Dropout(self.dropout),
             keras.layers.Dense(16, activation='relu'),
             keras.layers.Dense(1, activation='linear')  # Predict APY
         ])
@@ -121,8 +132,8 @@ class YieldPredictor:
             # Train model
             history = self.model.fit(
                 X_train, y_train,
-                epochs=50,
-                batch_size=32,
+                epochs=self.epochs,
+                batch_size=self.batch_size,
                 validation_data=(X_test, y_test),
                 verbose=1
             )
@@ -155,8 +166,8 @@ class YieldPredictor:
                 
                 # Inverse transform to get actual APY
                 dummy_array = np.zeros((1, len(self.feature_columns)))
-                dummy_array[0, 1] = prediction  # APY is at index 1
-                actual_prediction = self.scaler.inverse_transform(dummy_array)[0, 1]
+                dummy_array[0, self.target_index] = prediction
+                actual_prediction = self.scaler.inverse_transform(dummy_array)[0, self.target_index]
                 
                 return max(0, actual_prediction)  # Ensure non-negative APY
             else:
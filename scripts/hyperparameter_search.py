@@ -0,0 +1,406 @@
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+# numpy and TensorFlow (via ai_yield_predictor) are imported lazily: spawned
+# workers re-import this module, and must apply their thread limits before
+# BLAS and TensorFlow initialise their thread pools.
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_SPACE = {
+    'sequence_length': [14, 30, 60],
+    'lstm_units': [(32, 16), (64, 32), (128, 64)],
+    'dropout': [0.1, 0.2, 0.3],
+    'batch_size': [16, 32, 64],
+    'feature_columns': [
+        ['tvl', 'apy', 'volume_24h', 'price_change_24h',
+         'market_cap', 'volatility', 'liquidity_ratio'],
+        ['tvl', 'apy', 'volume_24h', 'volatility', 'liquidity_ratio'],
+        ['apy', 'volatility', 'liquidity_ratio'],
+    ],
+}
+
+# Per-worker cache of prepared sequences, keyed by window length
+_sequence_cache = {}
+
+
+def _init_worker(threads_per_trial):
+    """Limit TensorFlow/BLAS threading in a freshly spawned worker"""
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS',
+                'TF_NUM_INTRAOP_THREADS'):
+        os.environ[var] = str(threads_per_trial)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads_per_trial)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def _load_sequences(cache_dir, sequence_length):
+    """Load the cached train/validation split for a window length"""
+    import numpy as np
+
+    if sequence_length not in _sequence_cache:
+        path = os.path.join(cache_dir, f'sequences_{sequence_length}.npz')
+        with np.load(path) as cached:
+            _sequence_cache[sequence_length] = {
+                key: cached[key] for key in ('X_train', 'X_val', 'y_train', 'y_val')
+            }
+    return _sequence_cache[sequence_length]
+
+
+def _run_trial(trial_id, config, all_columns, cache_dir, checkpoint_dir,
+               start_epoch, target_epochs):
+    """Train a single trial up to target_epochs and report its validation MAE"""
+    from tensorflow import keras
+    from ai_yield_predictor import YieldPredictor
+
+    try:
+        predictor = YieldPredictor(**config)
+        sequences = _load_sequences(cache_dir, predictor.sequence_length)
+        columns = [all_columns.index(col) for col in predictor.feature_columns]
+        X_train = sequences['X_train'][:, :, columns]
+        X_val = sequences['X_val'][:, :, columns]
+        y_train, y_val = sequences['y_train'], sequences['y_val']
+
+        checkpoint = os.path.join(checkpoint_dir, f'trial_{trial_id}.h5')
+        if start_epoch > 0:
+            predictor.model = keras.models.load_model(checkpoint)
+        else:
+            predictor.model = predictor.build_model((X_train.shape[1], X_train.shape[2]))
+
+        predictor.model.fit(
+            X_train, y_train,
+            initial_epoch=start_epoch,
+            epochs=target_epochs,
+            batch_size=predictor.batch_size,
+            verbose=0
+        )
+        _, val_mae = predictor.model.evaluate(X_val, y_val, verbose=0)
+        predictor.model.save(checkpoint)
+
+        return {'trial_id': trial_id, 'val_mae': float(val_mae), 'error': None}
+
+    except Exception as e:
+        return {'trial_id': trial_id, 'val_mae': None, 'error': str(e)}
+
+
+class HyperparameterSearch:
+    """Successive-halving search over YieldPredictor hyperparameters"""
+
+    def __init__(self, search_space=None, n_trials=None, min_epochs=5,
+                 max_epochs=50, reduction_factor=3, max_workers=None,
+                 threads_per_trial=None, output_dir=None, max_retries=2,
+                 seed=42):
+        if min_epochs < 1:
+            raise ValueError(f"min_epochs must be at least 1, got {min_epochs}")
+        if max_epochs < min_epochs:
+            raise ValueError(f"max_epochs ({max_epochs}) must be at least min_epochs ({min_epochs})")
+        if reduction_factor <= 1:
+            raise ValueError(f"reduction_factor must be greater than 1, got {reduction_factor}")
+
+        self.search_space = search_space or DEFAULT_SEARCH_SPACE
+        self.n_trials = n_trials
+        self.min_epochs = min_epochs
+        self.max_epochs = max_epochs
+        self.reduction_factor = reduction_factor
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.threads_per_trial = threads_per_trial or max(
+            1, (os.cpu_count() or 1) // self.max_workers
+        )
+        self.output_dir = output_dir or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'hyperparameter_search'
+        )
+        self.cache_dir = os.path.join(self.output_dir, 'sequences')
+        self.checkpoint_dir = os.path.join(self.output_dir, 'checkpoints')
+        self.max_retries = max_retries  # Pool crashes before a trial runs in isolation
+        self.seed = seed
+
+    def generate_configs(self):
+        """Expand the search space into trial configurations"""
+        keys = list(self.search_space)
+        configs = [
+            dict(zip(keys, values))
+            for values in itertools.product(*(self.search_space[key] for key in keys))
+        ]
+        for config in configs:
+            if 'lstm_units' in config:
+                config['lstm_units'] = list(config['lstm_units'])
+            if 'feature_columns' in config and 'apy' not in config['feature_columns']:
+                raise ValueError(f"Feature subset {config['feature_columns']} must include 'apy'")
+
+        if self.n_trials is not None and self.n_trials < len(configs):
+            configs = random.Random(self.seed).sample(configs, self.n_trials)
+
+        return configs
+
+    def get_rungs(self):
+        """Epoch budgets for each successive-halving rung"""
+        rungs = []
+        epochs = self.min_epochs
+        while epochs < self.max_epochs:
+            rungs.append(epochs)
+            epochs = math.ceil(epochs * self.reduction_factor)
+        rungs.append(self.max_epochs)
+        return rungs
+
+    def prepare_sequence_cache(self, data, configs):
+        """Scale the data once and cache sequences for every window length"""
+        import numpy as np
+        from sklearn.model_selection import train_test_split
+        from ai_yield_predictor import YieldPredictor, DEFAULT_FEATURE_COLUMNS
+
+        all_columns = list(DEFAULT_FEATURE_COLUMNS)
+        for config in configs:
+            for col in config.get('feature_columns', []):
+                if col not in all_columns:
+                    all_columns.append(col)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # MinMax scaling is per column, so scaling the full feature set once is
+        # equivalent to scaling each trial's feature subset separately
+        predictor = YieldPredictor(feature_columns=all_columns)
+        scaled_features = predictor.scaler.fit_transform(data[all_columns].values)
+
+        # Hold out the same target rows for every window length, so trials with
+        # different sequence lengths are scored on identical validation targets
+        window_lengths = sorted({config.get('sequence_length', 30) for config in configs})
+        _, val_targets = train_test_split(
+            np.arange(max(window_lengths), len(scaled_features)), test_size=0.2, random_state=42
+        )
+        is_val_target = np.zeros(len(scaled_features), dtype=bool)
+        is_val_target[val_targets] = True
+
+        for sequence_length in window_lengths:
+            predictor.sequence_length = sequence_length
+            X, y = predictor.prepare_sequences(scaled_features)
+            # Window k predicts target row k + sequence_length
+            val_mask = is_val_target[sequence_length:]
+            X_train, X_val = X[~val_mask], X[val_mask]
+            y_train, y_val = y[~val_mask], y[val_mask]
+            np.savez(
+                os.path.join(self.cache_dir, f'sequences_{sequence_length}.npz'),
+                X_train=X_train, X_val=X_val, y_train=y_train, y_val=y_val
+            )
+            logger.info(f"Cached {len(X)} sequences for window length {sequence_length}")
+
+        return all_columns
+
+    def _create_executor(self):
+        """Process pool whose workers apply the per-trial thread limits"""
+        # Spawn rather than fork: TensorFlow is not fork-safe once initialised
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.threads_per_trial,)
+        )
+
+    def _remove_checkpoint(self, trial_id):
+        """Delete the checkpoint of a trial that will not be resumed"""
+        path = os.path.join(self.checkpoint_dir, f'trial_{trial_id}.h5')
+        if os.path.exists(path):
+            os.remove(path)
+
+    def run(self, data):
+        """Run the search and return the leaderboard, best trial first"""
+        configs = self.generate_configs()
+        all_columns = self.prepare_sequence_cache(data, configs)
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+        trials = {
+            trial_id: {
+                'trial_id': trial_id,
+                'config': config,
+                'epochs': 0,
+                'val_mae': None,
+                'status': 'running',
+                'error': None
+            }
+            for trial_id, config in enumerate(configs)
+        }
+        survivors = list(trials)
+        rungs = self.get_rungs()
+
+        logger.info(
+            f"Searching {len(configs)} configurations over rungs {rungs} "
+            f"with {self.max_workers} workers x {self.threads_per_trial} threads"
+        )
+
+        try:
+            for rung, target_epochs in enumerate(rungs):
+                results = self._run_rung(survivors, trials, all_columns, target_epochs)
+
+                completed = []
+                for trial_id in survivors:
+                    trial = trials[trial_id]
+                    result = results[trial_id]
+                    if not result['error'] and not math.isfinite(result['val_mae']):
+                        result['error'] = f"Non-finite validation MAE: {result['val_mae']}"
+
+                    if result['error']:
+                        logger.error(f"Trial {trial_id} failed: {result['error']}")
+                        trial['status'] = 'failed'
+                        trial['error'] = result['error']
+                        self._remove_checkpoint(trial_id)
+                        continue
+                    trial['epochs'] = target_epochs
+                    trial['val_mae'] = result['val_mae']
+                    completed.append(trial_id)
+
+                completed.sort(key=lambda trial_id: trials[trial_id]['val_mae'])
+                if rung == len(rungs) - 1:
+                    survivors = completed
+                    break
+
+                if not completed:
+                    logger.error(f"Rung {rung} ({target_epochs} epochs): no trials completed")
+                    survivors = []
+                    break
+
+                keep = max(1, math.ceil(len(completed) / self.reduction_factor))
+                survivors = completed[:keep]
+                for trial_id in completed[keep:]:
+                    trials[trial_id]['status'] = 'pruned'
+                    self._remove_checkpoint(trial_id)
+
+                logger.info(
+                    f"Rung {rung} ({target_epochs} epochs): kept {len(survivors)}/{len(completed)}, "
+                    f"best val MAE {trials[survivors[0]]['val_mae']:.4f}"
+                )
+
+            for trial_id in survivors:
+                trials[trial_id]['status'] = 'completed'
+
+        finally:
+            # Always record whatever finished, even if the search was interrupted
+            for trial in trials.values():
+                if trial['status'] == 'running':
+                    trial['status'] = 'interrupted'
+
+            leaderboard = sorted(
+                trials.values(),
+                key=lambda trial: (
+                    trial['status'] != 'completed',
+                    trial['status'] == 'failed',
+                    -trial['epochs'],
+                    trial['val_mae'] if trial['val_mae'] is not None else float('inf')
+                )
+            )
+            self.write_leaderboard(leaderboard)
+
+        return leaderboard
+
+    def _run_rung(self, trial_ids, trials, all_columns, target_epochs):
+        """Train trials up to target_epochs, retrying those caught in a pool crash"""
+        results = {}
+        crashes = {trial_id: 0 for trial_id in trial_ids}
+        pending = list(trial_ids)
+
+        while pending:
+            # A worker dying (OOM, segfault) breaks the whole pool and every
+            # unfinished trial with it. Retry those together on a fresh pool,
+            # and only run a trial alone once it has been caught in max_retries
+            # crashes, so the trial that actually crashes can be identified.
+            shared = [trial_id for trial_id in pending if crashes[trial_id] < self.max_retries]
+            isolated = [trial_id for trial_id in pending if crashes[trial_id] >= self.max_retries]
+            batches = ([shared] if shared else []) + [[trial_id] for trial_id in isolated]
+
+            pending = []
+            for batch in batches:
+                crashed = self._run_batch(batch, trials, all_columns, target_epochs, results)
+                for trial_id in crashed:
+                    crashes[trial_id] += 1
+                    if len(batch) == 1:
+                        results[trial_id] = {
+                            'trial_id': trial_id, 'val_mae': None,
+                            'error': f"Worker crashed {crashes[trial_id]} times, last time running alone"
+                        }
+                    else:
+                        pending.append(trial_id)
+
+                if crashed and len(batch) > 1:
+                    logger.warning(
+                        f"Process pool crashed; retrying {len(crashed)} unfinished trials "
+                        f"from epoch checkpoints"
+                    )
+
+        return results
+
+    def _run_batch(self, batch, trials, all_columns, target_epochs, results):
+        """Run a batch of trials on a fresh pool; returns the trials lost to a pool crash"""
+        crashed = []
+        executor = self._create_executor()
+        try:
+            futures = {
+                trial_id: executor.submit(
+                    _run_trial, trial_id, trials[trial_id]['config'], all_columns,
+                    self.cache_dir, self.checkpoint_dir,
+                    trials[trial_id]['epochs'], target_epochs
+                )
+                for trial_id in batch
+            }
+
+            for trial_id, future in futures.items():
+                try:
+                    results[trial_id] = future.result()
+                except BrokenProcessPool:
+                    crashed.append(trial_id)
+                except Exception as e:
+                    results[trial_id] = {'trial_id': trial_id, 'val_mae': None,
+                                         'error': f"{type(e).__name__}: {e}"}
+
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return crashed
+
+    def write_leaderboard(self, leaderboard):
+        """Write the leaderboard to the output directory"""
+        path = os.path.join(self.output_dir, 'leaderboard.json')
+        with open(path, 'w') as f:
+            json.dump({
+                'timestamp': datetime.now().isoformat(),
+                'rungs': self.get_rungs(),
+                'reduction_factor': self.reduction_factor,
+                'trials': leaderboard
+            }, f, indent=2)
+        logger.info(f"Leaderboard written to {path}")
+
+def main():
+    """Run a hyperparameter search on the predictor's market data"""
+    from ai_yield_predictor import YieldPredictor
+
+    data = YieldPredictor().fetch_market_data()
+    if data is None:
+        return {'success': False, 'error': 'Failed to fetch market data'}
+
+    search = HyperparameterSearch()
+    leaderboard = search.run(data)
+    if not leaderboard or leaderboard[0]['status'] != 'completed':
+        return {'success': False, 'error': 'No trial completed'}
+
+    best = leaderboard[0]
+    logger.info(f"Best trial {best['trial_id']}: val MAE {best['val_mae']:.4f}")
+    return {
+        'success': True,
+        'best_config': best['config'],
+        'best_val_mae': best['val_mae'],
+        'leaderboard': os.path.join(search.output_dir, 'leaderboard.json')
+    }
+
+if __name__ == "__main__":
+    result = main()
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,251 @@
+import numpy as np
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLDS = {
+    'mae': 1.5,               # Rolling MAE in APY percentage points
+    'bias': 1.0,              # Absolute rolling bias in APY percentage points
+    'coverage': 0.6,          # Minimum share of predictions within tolerance
+    'drift': 0.3,             # Maximum share of feature values outside training range
+    'min_samples': 10,        # Realized outcomes / feature rows needed before gates apply
+    'cooldown_seconds': 3600  # Minimum time between automatic retrains
+}
+
+
+def to_target_date(value):
+    """Normalise a date, datetime/Timestamp or ISO string to an ISO date key"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.isoformat()
+
+
+class PoolStats:
+    """Exponentially weighted error and drift statistics for a single pool"""
+
+    def __init__(self, n_features, alpha, max_pending):
+        self.alpha = alpha
+        self.max_pending = max_pending
+        self.pending = OrderedDict()  # target date -> predicted APY
+        self.samples = 0
+        self.mae = 0.0
+        self.bias = 0.0
+        self.coverage = 0.0
+        self.feature_samples = 0
+        self.out_of_range = np.zeros(n_features)
+        self.range_excess = np.zeros(n_features)
+
+    def _update(self, current, value, count):
+        # Plain mean until the window fills, then exponential decay
+        weight = max(self.alpha, 1.0 / count)
+        return current + weight * (value - current)
+
+    def add_pending(self, target_date, predicted_apy):
+        self.pending[target_date] = predicted_apy
+        self.pending.move_to_end(target_date)
+        while len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+
+    def record_error(self, predicted_apy, realized_apy, tolerance):
+        self.samples += 1
+        error = predicted_apy - realized_apy
+        self.mae = self._update(self.mae, abs(error), self.samples)
+        self.bias = self._update(self.bias, error, self.samples)
+        self.coverage = self._update(self.coverage, float(abs(error) <= tolerance), self.samples)
+
+    def record_features(self, scaled):
+        self.feature_samples += 1
+        excess = np.maximum(scaled - 1.0, 0.0) + np.maximum(-scaled, 0.0)
+        self.out_of_range = self._update(self.out_of_range, (excess > 0).astype(float), self.feature_samples)
+        self.range_excess = self._update(self.range_excess, excess, self.feature_samples)
+
+
+class ModelMonitor:
+    """Tracks live prediction accuracy and feature drift to gate retraining"""
+
+    def __init__(self, predictor, thresholds=None, window=50, tolerance=1.0, max_pending=5,
+                 max_pools=100, retrain_pools=None):
+        self.predictor = predictor
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.alpha = 2.0 / (window + 1)
+        self.tolerance = tolerance  # APY percentage points counted as "covered"
+        self.max_pending = max_pending
+        self.max_pools = max_pools
+        # Only these pools are scored on the predictor's own training data, so
+        # only they may trigger a retrain; other pools are reported only
+        self.retrain_pools = set(retrain_pools or [])
+        self.pools = OrderedDict()
+        self.last_retrain = None
+        self.last_retrain_attempt = None
+        self.lock = threading.Lock()
+
+    def _get_pool(self, pool):
+        if pool not in self.pools:
+            self.pools[pool] = PoolStats(len(self.predictor.feature_columns), self.alpha, self.max_pending)
+            self._evict_pools()
+        self.pools.move_to_end(pool)
+        return self.pools[pool]
+
+    def _evict_pools(self):
+        """Drop least recently used pools beyond max_pools, keeping retrain pools"""
+        for pool in list(self.pools):
+            if len(self.pools) <= self.max_pools:
+                break
+            if pool not in self.retrain_pools:
+                del self.pools[pool]
+
+    def _scale(self, features):
+        """Scale a feature row against the scaler's training min/max"""
+        scaler = self.predictor.scaler
+        if not hasattr(scaler, 'data_min_'):
+            return None
+        values = np.asarray(features, dtype=float)
+        data_range = np.where(scaler.data_range_ == 0, 1.0, scaler.data_range_)
+        return (values - scaler.data_min_) / data_range
+
+    def record_prediction(self, pool, target_date, predicted_apy, features=None):
+        """Store a prediction for target_date and score its inputs for drift"""
+        try:
+            target_date = to_target_date(target_date)
+            predicted_apy = float(predicted_apy)
+            if not math.isfinite(predicted_apy):
+                raise ValueError(f"Non-finite predicted APY: {predicted_apy}")
+            scaled = self._scale(features) if features is not None else None
+            if scaled is not None and not np.all(np.isfinite(scaled)):
+                raise ValueError("Non-finite feature values")
+
+            with self.lock:
+                stats = self._get_pool(pool)
+                stats.add_pending(target_date, predicted_apy)
+                if scaled is not None:
+                    stats.record_features(scaled)
+
+        except Exception as e:
+            logger.error(f"Error recording prediction: {e}")
+
+    def record_realized(self, pool, target_date, realized_apy):
+        """Join the realized APY with the prediction made for the same date"""
+        try:
+            target_date = to_target_date(target_date)
+            realized_apy = float(realized_apy)
+            if not math.isfinite(realized_apy):
+                raise ValueError(f"Non-finite realized APY: {realized_apy}")
+
+            with self.lock:
+                stats = self.pools.get(pool)
+                if stats is None or target_date not in stats.pending:
+                    return False
+
+                self.pools.move_to_end(pool)
+                predicted_apy = stats.pending.pop(target_date)
+                stats.record_error(predicted_apy, realized_apy, self.tolerance)
+                return True
+
+        except Exception as e:
+            logger.error(f"Error recording realized APY: {e}")
+            return False
+
+    def get_pending_targets(self, pool):
+        """Target dates still waiting for a realized APY"""
+        with self.lock:
+            stats = self.pools.get(pool)
+            return list(stats.pending) if stats is not None else []
+
+    def get_pool_stats(self, pool):
+        """Current rolling statistics for a pool"""
+        with self.lock:
+            stats = self.pools.get(pool)
+            if stats is None:
+                return None
+
+            return {
+                'samples': stats.samples,
+                'feature_samples': stats.feature_samples,
+                'gates_retraining': pool in self.retrain_pools,
+                'pending_targets': list(stats.pending),
+                'mae': stats.mae,
+                'bias': stats.bias,
+                'coverage': stats.coverage,
+                'drift_score': float(stats.out_of_range.max()) if stats.feature_samples else 0.0,
+                'feature_drift': {
+                    column: {
+                        'out_of_range_rate': float(stats.out_of_range[i]),
+                        'range_excess': float(stats.range_excess[i])
+                    }
+                    for i, column in enumerate(self.predictor.feature_columns)
+                }
+            }
+
+    def get_retrain_reasons(self, pool):
+        """Threshold breaches for a pool (empty when the model looks healthy)"""
+        stats = self.get_pool_stats(pool)
+        if stats is None:
+            return []
+
+        reasons = []
+        if stats['feature_samples'] >= self.thresholds['min_samples']:
+            if stats['drift_score'] > self.thresholds['drift']:
+                reasons.append(f"Feature drift {stats['drift_score']:.2f} exceeds {self.thresholds['drift']}")
+
+        if stats['samples'] >= self.thresholds['min_samples']:
+            if stats['mae'] > self.thresholds['mae']:
+                reasons.append(f"Rolling MAE {stats['mae']:.2f} exceeds {self.thresholds['mae']}")
+            if abs(stats['bias']) > self.thresholds['bias']:
+                reasons.append(f"Rolling bias {stats['bias']:.2f} exceeds {self.thresholds['bias']}")
+            if stats['coverage'] < self.thresholds['coverage']:
+                reasons.append(f"Coverage {stats['coverage']:.2f} below {self.thresholds['coverage']}")
+
+        return reasons
+
+    def should_retrain(self, pool):
+        """Whether thresholds are crossed and the retrain cooldown has elapsed"""
+        if pool not in self.retrain_pools:
+            return False
+
+        if self.last_retrain_attempt is not None:
+            if time.time() - self.last_retrain_attempt < self.thresholds['cooldown_seconds']:
+                return False
+
+        return bool(self.get_retrain_reasons(pool))
+
+    def mark_retrain_attempt(self):
+        """Start the cooldown, whether or not the retrain succeeded"""
+        with self.lock:
+            self.last_retrain_attempt = time.time()
+
+    def mark_retrained(self):
+        """Reset statistics after the model (and its scaler ranges) changed"""
+        with self.lock:
+            self.pools = OrderedDict()
+            self.last_retrain = time.time()
+
+    def get_summary(self):
+        """Statistics and retraining status for every monitored pool"""
+        with self.lock:
+            pools = list(self.pools)
+
+        summary = {}
+        for pool in pools:
+            stats = self.get_pool_stats(pool)
+            if stats is not None:
+                summary[pool] = {**stats, 'retrain_reasons': self.get_retrain_reasons(pool)}
+
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'thresholds': self.thresholds,
+            'last_retrain': datetime.fromtimestamp(self.last_retrain).isoformat() if self.last_retrain else None,
+            'last_retrain_attempt': (
+                datetime.fromtimestamp(self.last_retrain_attempt).isoformat()
+                if self.last_retrain_attempt else None
+            ),
+            'pools': summary
+        }